@@ -9,6 +9,9 @@ from typing import Optional, Tuple, List, Dict, Any
 
 from playwright.sync_api import sync_playwright # Use sync API
 
+from .smart_cache import chart_fingerprint, get_cache
+from .performance_monitor import get_monitor
+
 class ChartGenerator:
     def __init__(self, output_dir: str = "generated_reports"):
         self.output_dir = output_dir
@@ -18,8 +21,32 @@ class ChartGenerator:
         ))
         if not os.path.exists(self.template_path):
             raise FileNotFoundError(f"Chart template not found at {self.template_path}")
+        # Long-lived Playwright instance and browser started by warm(); when None,
+        # every chart launches its own browser.
+        self._playwright = None
+        self._browser = None
         print(f"ChartGenerator initialized. Template: {self.template_path}, Output: {self.output_dir}")
 
+    def warm(self) -> None:
+        """
+        Launches a long-lived browser so later charts only open a new page instead of
+        starting Firefox each time. The sync Playwright API is bound to the thread that
+        created it, so this is meant for single-threaded batches (e.g. the CLI's --server mode).
+        """
+        if self._browser is None:
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.firefox.launch()
+            print("ChartGenerator: Warm browser launched.")
+
+    def close(self) -> None:
+        """Shuts down the browser and Playwright instance started by warm()."""
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
     def _format_data_for_js(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
         """Formats the DataFrame for the Lightweight Charts library."""
         ohlc_data = []
@@ -169,9 +196,7 @@ class ChartGenerator:
 
     def _get_data_hash(self, df: pd.DataFrame) -> str:
         """生成数据的哈希值，用于缓存键"""
-        from .smart_cache import get_cache
-        cache = get_cache()
-        return cache._get_dataframe_hash(df)
+        return chart_fingerprint(df)
 
     def extract_key_data(self, raw_df: pd.DataFrame) -> Optional[dict]:
         """
@@ -191,64 +216,30 @@ class ChartGenerator:
         ohlc_data, volume_data, stoch_k_data, stoch_d_data = self._format_data_for_js(df_with_indicators)
         indicator_data = self._get_indicator_data_for_js(df_with_indicators)
         key_data_dict = self._extract_key_data(df_with_indicators)
+        chart_args = {
+            "ohlcData": ohlc_data, "volumeData": volume_data, "stochKData": stoch_k_data,
+            "stochDData": stoch_d_data, "bbuData": indicator_data.get('bbu', []),
+            "bbmData": indicator_data.get('bbm', []), "bblData": indicator_data.get('bbl', []),
+            "tickerSymbol": ticker_symbol.upper(), "interval": interval,
+            "chartWidth": 1280, "chartHeight": 720
+        }
         
+        if self._browser is not None:
+            # Warm path: reuse the long-lived browser, opening just a new page
+            print(f"Playwright: Rendering {ticker_symbol} in warm browser...")
+            try:
+                image_bytes = self._render_chart(self._browser, chart_args)
+                print(f"Playwright: Screenshot captured for {ticker_symbol}.")
+                return image_bytes, key_data_dict
+            except Exception as e:
+                print(f"An error occurred during chart generation for {ticker_symbol}: {e}", file=sys.stderr)
+                raise
+
         print(f"Playwright: Launching self-contained browser for {ticker_symbol}...")
         try:
             with sync_playwright() as p:
                 browser = p.firefox.launch() # Use Firefox for better cloud compatibility
-                page = browser.new_page()
-                page.on("console", lambda msg: print(f"Browser Console ({msg.type}): {msg.text}"))
-                
-                template_url = f"file://{self.template_path}"
-                page.goto(template_url)
-                page.wait_for_function("typeof window.renderChart === 'function'")
-
-                # Add debug information before calling renderChart
-                chart_args = {
-                    "ohlcData": ohlc_data, "volumeData": volume_data, "stochKData": stoch_k_data,
-                    "stochDData": stoch_d_data, "bbuData": indicator_data.get('bbu', []),
-                    "bbmData": indicator_data.get('bbm', []), "bblData": indicator_data.get('bbl', []),
-                    "tickerSymbol": ticker_symbol.upper(), "interval": interval,
-                    "chartWidth": 1280, "chartHeight": 720
-                }
-                
-                print(f"Chart args - OHLC: {len(chart_args['ohlcData'])}, Volume: {len(chart_args['volumeData'])}")
-                if chart_args['ohlcData']:
-                    print(f"Sample OHLC data: {chart_args['ohlcData'][0]}")
-                
-                # Call renderChart with error handling
-                result = page.evaluate("""
-                    (args) => {
-                        console.log('renderChart called with args:', {
-                            ohlcDataLength: args.ohlcData.length,
-                            volumeDataLength: args.volumeData.length,
-                            tickerSymbol: args.tickerSymbol,
-                            interval: args.interval
-                        });
-                        
-                        if (args.ohlcData.length === 0) {
-                            console.error('No OHLC data provided!');
-                            return 'ERROR: No OHLC data';
-                        }
-                        
-                        try {
-                            return window.renderChart(args);
-                        } catch (error) {
-                            console.error('Error in renderChart:', error);
-                            return 'ERROR: ' + error.message;
-                        }
-                    }
-                """, chart_args)
-                
-                print(f"Chart render result: {result}")
-                
-                # Wait longer for chart rendering
-                page.wait_for_timeout(3000)
-                chart_element = page.query_selector('#chart-container-wrapper')
-                if not chart_element:
-                    raise RuntimeError("Could not find '#chart-container-wrapper' element in HTML.")
-                
-                image_bytes = chart_element.screenshot()
+                image_bytes = self._render_chart(browser, chart_args)
                 browser.close()
                 
                 print(f"Playwright: Screenshot captured and browser closed for {ticker_symbol}.")
@@ -258,15 +249,63 @@ class ChartGenerator:
             print(f"An error occurred during chart generation for {ticker_symbol}: {e}", file=sys.stderr)
             raise
 
+    def _render_chart(self, browser, chart_args: Dict[str, Any]) -> bytes:
+        """Renders the chart in a new page of the given browser and returns the screenshot bytes."""
+        page = browser.new_page()
+        try:
+            page.on("console", lambda msg: print(f"Browser Console ({msg.type}): {msg.text}"))
+            
+            template_url = f"file://{self.template_path}"
+            page.goto(template_url)
+            page.wait_for_function("typeof window.renderChart === 'function'")
+
+            # Add debug information before calling renderChart
+            print(f"Chart args - OHLC: {len(chart_args['ohlcData'])}, Volume: {len(chart_args['volumeData'])}")
+            if chart_args['ohlcData']:
+                print(f"Sample OHLC data: {chart_args['ohlcData'][0]}")
+            
+            # Call renderChart with error handling
+            result = page.evaluate("""
+                (args) => {
+                    console.log('renderChart called with args:', {
+                        ohlcDataLength: args.ohlcData.length,
+                        volumeDataLength: args.volumeData.length,
+                        tickerSymbol: args.tickerSymbol,
+                        interval: args.interval
+                    });
+                    
+                    if (args.ohlcData.length === 0) {
+                        console.error('No OHLC data provided!');
+                        return 'ERROR: No OHLC data';
+                    }
+                    
+                    try {
+                        return window.renderChart(args);
+                    } catch (error) {
+                        console.error('Error in renderChart:', error);
+                        return 'ERROR: ' + error.message;
+                    }
+                }
+            """, chart_args)
+            
+            print(f"Chart render result: {result}")
+            
+            # Wait longer for chart rendering
+            page.wait_for_timeout(3000)
+            chart_element = page.query_selector('#chart-container-wrapper')
+            if not chart_element:
+                raise RuntimeError("Could not find '#chart-container-wrapper' element in HTML.")
+            
+            return chart_element.screenshot()
+        finally:
+            page.close()
+
     def generate_chart_from_df_cached(self, raw_df: pd.DataFrame, ticker_symbol: str, interval: str) -> Tuple[Optional[bytes], Optional[dict]]:
         """
         缓存优化的图表生成函数
         基于数据哈希生成缓存键，确保数据变化时重新生成
         性能提升：相同数据的图表从20s减少到0.5s
         """
-        from .smart_cache import get_cache
-        from .performance_monitor import get_monitor
-        
         start_time = time.time()
         cache = get_cache()
         monitor = get_monitor()
@@ -1,14 +1,20 @@
-import os
 import json
 import re
+from itertools import islice
 from openai import AsyncOpenAI
 from typing import Dict, Any, Optional
+from config.settings import get_settings
 
 # Simple in-memory cache for common instructions
 _instruction_cache: Dict[str, Dict[str, Any]] = {}
 
+# Command shapes handled locally, compiled once at import
+_TICKER_RE = re.compile(r'^[A-Z]{1,5}(-[A-Z]{3})?$')
+_TICKER_INTERVAL_RE = re.compile(r'^([A-Z]{1,5}(?:-[A-Z]{3})?)\s+(\d+[HMWD])$')
+_TICKER_EXCHANGE_INTERVAL_RE = re.compile(r'^([A-Z-]{3,10})\s+([A-Z]{4,10})\s+(\d+[HMWD])$')
+
 # It's good practice to get the API key from environment variables
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_API_KEY = get_settings().DEEPSEEK_API_KEY
 if not DEEPSEEK_API_KEY:
     raise ValueError("DEEPSEEK_API_KEY environment variable not set.")
 
@@ -49,31 +55,34 @@ def _parse_simple_command(user_input: str) -> Optional[Dict[str, Any]]:
     text = user_input.strip().upper()
     
     # Pattern 1: Simple ticker (AAPL, TSLA, etc.)
-    if re.match(r'^[A-Z]{1,5}(-[A-Z]{3})?$', text):
+    if _TICKER_RE.match(text):
         return {
             "status": "valid",
             "command": f"{text} 1d 150",
-            "explanation": f"收到主人！马上分析 {text} 的走势～ ✨"
+            "explanation": f"收到主人！马上分析 {text} 的走势～ ✨",
+            "path": "local"
         }
     
     # Pattern 2: Ticker + interval (AAPL 1h, TSLA 4h, etc.)
-    match = re.match(r'^([A-Z]{1,5}(?:-[A-Z]{3})?)\s+(\d+[HMWD])$', text)
+    match = _TICKER_INTERVAL_RE.match(text)
     if match:
         ticker, interval = match.groups()
         return {
             "status": "valid", 
             "command": f"{ticker} {interval.lower()} 150",
-            "explanation": f"了解！{ticker} {interval} 图表分析马上来～ 🚀"
+            "explanation": f"了解！{ticker} {interval} 图表分析马上来～ 🚀",
+            "path": "local"
         }
     
     # Pattern 3: Ticker + exchange + interval (BTC-USD KRAKEN 1h)
-    match = re.match(r'^([A-Z-]{3,10})\s+([A-Z]{4,10})\s+(\d+[HMWD])$', text)
+    match = _TICKER_EXCHANGE_INTERVAL_RE.match(text)
     if match:
         ticker, exchange, interval = match.groups()
         return {
             "status": "valid",
             "command": f"{ticker} {exchange} {interval.lower()} 150", 
-            "explanation": f"收到！{exchange}交易所的{ticker} {interval}图分析～ ⚡"
+            "explanation": f"收到！{exchange}交易所的{ticker} {interval}图分析～ ⚡",
+            "path": "local"
         }
     
     # If no pattern matches, needs LLM processing
@@ -83,11 +92,13 @@ async def validate_and_extract_command(user_input: str) -> Dict[str, Any]:
     """
     Uses fast local parsing first, then LLM for complex cases.
     Includes caching for improved performance.
+    The result's "path" key records which route produced it: "local" or "llm".
     """
     # Check cache first
     cache_key = _normalize_input(user_input)
-    if cache_key in _instruction_cache:
-        return _instruction_cache[cache_key]
+    cached = _instruction_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     # Try fast local parsing first
     local_result = _parse_simple_command(user_input)
@@ -117,6 +128,7 @@ async def validate_and_extract_command(user_input: str) -> Dict[str, Any]:
         # Basic validation
         if not all(k in parsed_content for k in ["status", "command", "explanation"]):
             raise ValueError("LLM response is missing required keys.")
+        parsed_content["path"] = "llm"
 
         # Cache the result
         _instruction_cache[cache_key] = parsed_content
@@ -127,7 +139,8 @@ async def validate_and_extract_command(user_input: str) -> Dict[str, Any]:
         fallback = {
             "status": "clarification_needed",
             "command": None,
-            "explanation": "处理您的请求时遇到一点小问题，您能换个方式再问一次吗？"
+            "explanation": "处理您的请求时遇到一点小问题，您能换个方式再问一次吗？",
+            "path": "llm"
         }
         _instruction_cache[cache_key] = fallback
         return fallback
@@ -137,7 +150,8 @@ async def validate_and_extract_command(user_input: str) -> Dict[str, Any]:
         fallback = {
             "status": "clarification_needed", 
             "command": None,
-            "explanation": "抱歉，我的大脑好像短路了... 能请您再说一遍您的指令吗？"
+            "explanation": "抱歉，我的大脑好像短路了... 能请您再说一遍您的指令吗？",
+            "path": "llm"
         }
         _instruction_cache[cache_key] = fallback
         return fallback
@@ -151,5 +165,5 @@ def get_cache_stats() -> Dict[str, Any]:
     """Get cache statistics"""
     return {
         "cached_instructions": len(_instruction_cache),
-        "cache_keys": list(_instruction_cache.keys())[:10]  # Show first 10 for debugging
+        "cache_keys": list(islice(_instruction_cache, 10))  # Show first 10 for debugging, without copying every key
     } 
\ No newline at end of file
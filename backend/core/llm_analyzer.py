@@ -1,10 +1,12 @@
 # backend/core/llm_analyzer.py
-import os
 import asyncio
 import time
 import hashlib
 from typing import Optional, Dict, Any
 from openai import AsyncOpenAI
+from config.settings import get_settings
+from .smart_cache import get_cache
+from .performance_monitor import get_monitor
 
 def _get_system_prompt() -> str:
     """Returns the static system prompt for the financial analyst expert."""
@@ -58,36 +60,6 @@ Chart Patterns: 识别关键的支撑、阻力、趋势线或简单形态。
 股票代码: {ticker_symbol}"""
 
 
-def _get_deepseek_api_key() -> Optional[str]:
-    """
-    Gets the DEEPSEEK_API_KEY from environment variables first, then fallback to .env file.
-    """
-    # First try to get from environment variables (Docker/system env)
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if api_key:
-        print("Successfully loaded DEEPSEEK_API_KEY from environment variables")
-        return api_key
-    
-    # Fallback to .env file if environment variable not found
-    try:
-        dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
-        if not os.path.exists(dotenv_path):
-            print(f"Warning: .env file not found at {dotenv_path}")
-            return None
-        
-        with open(dotenv_path, 'r') as f:
-            for line in f:
-                if line.strip() and not line.startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    if key.strip() == 'DEEPSEEK_API_KEY':
-                        print("Successfully loaded DEEPSEEK_API_KEY from .env file")
-                        return value.strip().strip('"\'')
-        return None
-    except Exception as e:
-        print(f"Error reading .env file for DEEPSEEK_API_KEY: {e}")
-        return None
-
-
 class LLMAnalyzer:
     """
     Handles interaction with a large language model to analyze stock data.
@@ -118,7 +90,8 @@ class LLMAnalyzer:
 
     def _setup_client(self):
         if self.model_provider == "deepseek":
-            api_key = _get_deepseek_api_key()
+            # Settings已合并环境变量与.env（环境变量优先）
+            api_key = get_settings().DEEPSEEK_API_KEY
             if not api_key:
                 raise ValueError("DEEPSEEK_API_KEY is not set correctly in the .env file.")
             
@@ -182,9 +155,6 @@ class LLMAnalyzer:
         基于ticker和关键财务数据哈希进行缓存
         性能提升：相同分析请求从3s减少到0.1s
         """
-        from .smart_cache import get_cache
-        from .performance_monitor import get_monitor
-        
         start_time = time.time()
         cache = get_cache()
         monitor = get_monitor()
@@ -1,21 +1,25 @@
 # backend/core/orchestrator.py
 import asyncio
 import os
-import json
 import subprocess
 import sys
 import time
-import uuid
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
+import orjson
 import pandas as pd
 from backend.core.chart_generator import ChartGenerator
 from backend.core.llm_analyzer import LLMAnalyzer
 from .data_fetcher import get_ohlcv_data_cached
+from .smart_cache import get_cache
+from .performance_monitor import get_monitor
 from backend.db.reports import init_db, insert_report
 from zoneinfo import ZoneInfo
 
+# 报告合成CLI脚本路径，模块加载时解析一次
+REPORT_CLI_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'convert_report_cli.py'))
+
 class AnalysisOrchestrator:
     def __init__(self, output_dir: str = "generated_reports"):
         # 初始化报告数据库
@@ -25,15 +29,16 @@ class AnalysisOrchestrator:
         self.chart_generator = ChartGenerator()
         
         # 初始化缓存和性能监控
-        from .smart_cache import get_cache
-        from .performance_monitor import get_monitor
         self.cache = get_cache()
         self.monitor = get_monitor()
         
+        # 正在进行中的报告任务，相同参数的并发请求共享同一个任务
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        
         os.makedirs(self.output_dir, exist_ok=True)
         print(f"AnalysisOrchestrator initialized with smart cache. Output directory: {self.output_dir}")
 
-    def _create_report_paths(self, ticker: str, interval: str) -> Tuple[str, str, str, str, str]:
+    def _create_report_paths(self, ticker: str, interval: str) -> Tuple[str, str, str, str]:
         """Creates and returns paths for the report directory and its contents."""
         # 按日期分目录存储
         date_str = datetime.now(ZoneInfo("Asia/Shanghai")).strftime("%Y-%m-%d")
@@ -46,14 +51,23 @@ class AnalysisOrchestrator:
         os.makedirs(report_dir, exist_ok=True)
         print(f"Orchestrator: Created output directory: {report_dir}")
 
-        temp_data_filename = f"data_{uuid.uuid4()}.json"
-        temp_data_path = os.path.join(report_dir, temp_data_filename)
-
         chart_path = os.path.join(report_dir, "chart.png")
         analysis_path = os.path.join(report_dir, "analysis.md")
-        final_report_path = os.path.join(report_dir, "final_report.png")
+        final_report_path = os.path.join(report_dir, "final_report.jpg")
         
-        return report_dir, temp_data_path, chart_path, analysis_path, final_report_path
+        return report_dir, chart_path, analysis_path, final_report_path
+
+    @staticmethod
+    def _write_text_file(path: str, text: str) -> None:
+        """Writes a UTF-8 text file; used from the executor so the event loop isn't blocked."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    @staticmethod
+    def _write_bytes_file(path: str, data: bytes) -> None:
+        """Writes a binary file; used from the executor so the event loop isn't blocked."""
+        with open(path, "wb") as f:
+            f.write(data)
 
     async def _run_cli_in_executor(self, command: list) -> bool:
         """Runs a blocking CLI command in a separate thread to avoid blocking the asyncio event loop."""
@@ -105,10 +119,32 @@ class AnalysisOrchestrator:
             return False
 
     async def generate_report(self, ticker: str, interval: str, num_candles: int, exchange: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """生成报告，返回(最终报告路径, 消息)"""
+        final_report_path, _, message = await self.generate_report_with_analysis(ticker, interval, num_candles, exchange)
+        return final_report_path, message
+
+    async def generate_report_with_analysis(self, ticker: str, interval: str, num_candles: int, exchange: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        生成报告，返回(最终报告路径, 分析文本, 消息)
+        分析文本直接取自内存，调用方无需再从磁盘读回analysis.md
+        相同参数的并发请求合并为一次生成（singleflight），共享同一份结果
+        """
+        key = (ticker, interval, num_candles, exchange)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_report_with_analysis(ticker, interval, num_candles, exchange))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            print(f"🔁 Orchestrator: Joining in-flight report for {ticker} {interval}")
+        # shield: 某个请求被取消时不影响其他正在等待同一任务的请求
+        return await asyncio.shield(task)
+
+    async def _generate_report_with_analysis(self, ticker: str, interval: str, num_candles: int, exchange: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
         total_start_time = time.monotonic()
         print(f"🚀 === Orchestrator: Starting CACHED report for {ticker} (Exchange: {exchange or 'N/A'}) ===")
         
-        report_dir, temp_data_path, chart_path, analysis_path, final_report_path = self._create_report_paths(ticker, interval)
+        report_dir, chart_path, analysis_path, final_report_path = self._create_report_paths(ticker, interval)
         
         # === Phase 1: 缓存优化的数据获取 ===
         print(f"\n📊 Phase 1: Smart Data Fetching for {ticker}...")
@@ -123,10 +159,8 @@ class AnalysisOrchestrator:
         if ohlcv_df is None or ohlcv_df.empty:
             print(f"❌ Orchestrator: Failed to fetch data for {ticker}. Aborting.")
             self.monitor.track_request(False, time.monotonic() - total_start_time)
-            return None, "Data fetching failed."
+            return None, None, "Data fetching failed."
         
-        # Save data to temp file for the CLI script, using a robust orientation
-        ohlcv_df.to_json(temp_data_path, orient='split')
         time_s1_fetch_end = time.monotonic()
         
         fetch_duration = time_s1_fetch_end - time_s1_fetch_start
@@ -134,11 +168,12 @@ class AnalysisOrchestrator:
 
         # === Phase 2: 关键数据提取 ===
         print(f"\n🔢 Phase 2: Key Data Extraction...")
-        key_data = self.chart_generator.extract_key_data(ohlcv_df)
+        # 指标计算是CPU密集的pandas操作，放到线程池避免阻塞事件循环
+        key_data = await loop.run_in_executor(None, self.chart_generator.extract_key_data, ohlcv_df)
         if not key_data:
             print(f"❌ Orchestrator: Failed to calculate key data for {ticker}. Aborting.")
             self.monitor.track_request(False, time.monotonic() - total_start_time)
-            return None, "Key data calculation failed."
+            return None, None, "Key data calculation failed."
         
         print(f"✅ Phase 2 completed - Key data extracted: {len(key_data)} indicators")
 
@@ -171,39 +206,38 @@ class AnalysisOrchestrator:
                 import traceback
                 traceback.print_exc()
                 self.monitor.track_request(False, time.monotonic() - total_start_time)
-                return None, f"{task_name} error: {result}"
+                return None, None, f"{task_name} error: {result}"
             elif result is None:
                 print(f"❌ Orchestrator: {task_name} returned None (likely failed)")
                 self.monitor.track_request(False, time.monotonic() - total_start_time)  
-                return None, f"{task_name} returned None"
+                return None, None, f"{task_name} returned None"
             else:
                 print(f"⚠️ Orchestrator: {task_name} returned unexpected result type: {type(result)}")
                 print(f"   Result content: {result}")
                 # 尝试继续处理，可能是我们未预期的有效结果
         
-        if not chart_success or not os.path.exists(chart_path):
+        # chart_success为True时_generate_chart_cached已写好chart_path，无需再stat一次
+        if not chart_success:
             print(f"❌ Orchestrator: Chart generation failed for {ticker}.")
             self.monitor.track_request(False, time.monotonic() - total_start_time)
-            return None, "Chart generation failed."
+            return None, None, "Chart generation failed."
 
         if not analysis_text:
             print(f"❌ Orchestrator: LLM analysis failed for {ticker}.")
             self.monitor.track_request(False, time.monotonic() - total_start_time)
-            return None, "LLM analysis failed."
+            return None, None, "LLM analysis failed."
 
         # === Phase 4: 报告合成 ===
         print(f"\n📄 Phase 4: Report Synthesis...")
-        with open(analysis_path, "w", encoding="utf-8") as f:
-            f.write(analysis_text)
+        await loop.run_in_executor(None, self._write_text_file, analysis_path, analysis_text)
         print(f"✅ Analysis saved to {analysis_path}")
         
         time_s4_convert_start = time.monotonic()
-        report_cli_script = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'convert_report_cli.py'))
         
-        key_data_json_string = json.dumps(key_data)
+        key_data_json_string = orjson.dumps(key_data, option=orjson.OPT_SERIALIZE_NUMPY).decode()
 
         report_command = [
-            sys.executable, report_cli_script,
+            sys.executable, REPORT_CLI_SCRIPT,
             "--markdown-file", analysis_path,
             "--chart-file", chart_path,
             "--output-file", final_report_path,
@@ -216,24 +250,17 @@ class AnalysisOrchestrator:
         if not await self._run_cli_in_executor(report_command):
             print(f"❌ Orchestrator: Failed to generate final report for {ticker}.")
             self.monitor.track_request(False, time.monotonic() - total_start_time)
-            return None, "Report conversion failed."
+            return None, None, "Report conversion failed."
         
         time_s4_convert_end = time.monotonic()
         synthesis_duration = time_s4_convert_end - time_s4_convert_start
         print(f"✅ Phase 4 completed in {synthesis_duration:.2f}s")
         
-        if not os.path.exists(final_report_path):
+        if not await loop.run_in_executor(None, os.path.exists, final_report_path):
             print(f"❌ Orchestrator: Final report not found at {final_report_path}.")
             self.monitor.track_request(False, time.monotonic() - total_start_time)
-            return None, "Final report not found."
+            return None, None, "Final report not found."
         
-        # === 清理和统计 ===
-        try:
-            os.remove(temp_data_path)
-            print(f"🧹 Cleaned up temporary file: {temp_data_path}")
-        except OSError as e:
-            print(f"⚠️ Error cleaning up temporary file: {e}")
-
         # 插入报告索引
         generated_at = datetime.now(ZoneInfo("Asia/Shanghai")).strftime("%Y-%m-%d %H:%M:%S")
         insert_report(
@@ -267,13 +294,12 @@ class AnalysisOrchestrator:
         print(f"   📁 Report saved: {final_report_path}")
         
         # 显示缓存统计
-        cache_stats = self.cache.get_cache_stats()
         hit_rates = self.monitor.get_cache_hit_rates()
         print(f"\n💾 Cache Performance:")
         for cache_type, rate in hit_rates.items():
             print(f"   {cache_type.capitalize()}: {rate:.1f}% hit rate")
         
-        return final_report_path, "Report generated successfully with smart caching!"
+        return final_report_path, analysis_text, "Report generated successfully with smart caching!"
 
     async def _generate_chart_cached(self, ohlcv_df: pd.DataFrame, ticker: str, interval: str, chart_path: str) -> bool:
         """使用缓存版本生成图表的辅助方法"""
@@ -281,7 +307,6 @@ class AnalysisOrchestrator:
             print(f"📊 Chart Generation: Starting for {ticker} {interval}")
             
             # 在线程池中执行同步的Playwright调用
-            import asyncio
             loop = asyncio.get_event_loop()
             chart_bytes, _ = await loop.run_in_executor(
                 None, 
@@ -290,8 +315,7 @@ class AnalysisOrchestrator:
             )
             
             if chart_bytes and len(chart_bytes) > 0:
-                with open(chart_path, 'wb') as f:
-                    f.write(chart_bytes)
+                await loop.run_in_executor(None, self._write_bytes_file, chart_path, chart_bytes)
                 print(f"📊 Chart Generation: Success - {len(chart_bytes)} bytes written to {chart_path}")
                 return True
             else:
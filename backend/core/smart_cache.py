@@ -1,16 +1,55 @@
 # backend/core/smart_cache.py
+import io
 import os
 import json
 import hashlib
 import pickle
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, Union
 import pandas as pd
 from pathlib import Path
 import yaml
 
+try:
+    import pyarrow.feather as feather
+except ImportError:  # 未安装pyarrow时DataFrame回退到pickle
+    feather = None
+
+try:
+    from blake3 import blake3
+except ImportError:  # 未安装blake3时回退到hashlib.blake2b
+    blake3 = None
+
+# 磁盘缓存文件头，用于在读取时分派反序列化方式
+_MAGIC_FEATHER = b"FTHR"
+_MAGIC_PICKLE = b"PKL1"
+_MAGIC_RAW = b"RAW1"
+_MAGIC_LEN = 4
+
+def _hexdigest(*chunks, digest_size: int) -> str:
+    """对若干字节块计算哈希，优先使用SIMD加速的blake3"""
+    hasher = blake3() if blake3 is not None else hashlib.blake2b(digest_size=digest_size)
+    for chunk in chunks:
+        hasher.update(chunk)
+    if blake3 is not None:
+        return hasher.hexdigest(length=digest_size)
+    return hasher.hexdigest()
+
+def chart_fingerprint(df: pd.DataFrame) -> str:
+    """
+    生成图表输入数据的指纹，作为图表/分析缓存键中的data_hash
+    对完整数据（含索引）做向量化逐行哈希，避免只比较首尾行导致的键冲突
+    """
+    if df is None or df.empty:
+        return "empty_df"
+    
+    row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    columns = '|'.join(map(str, df.columns)).encode()
+    return _hexdigest(columns, memoryview(row_hashes).cast("B"), digest_size=8)
+
 class SmartCache:
     """
     多层智能缓存系统
@@ -20,25 +59,13 @@ class SmartCache:
     - LRU内存管理
     """
     
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls):
-        """单例模式确保全局唯一缓存实例"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-        return cls._instance
+    # 磁盘用量计数器的重新扫描间隔（秒）
+    DISK_RESCAN_INTERVAL = 60
     
     def __init__(self):
-        if hasattr(self, '_initialized'):
-            return
-        
-        self._initialized = True
-        self._memory_cache: Dict[str, Dict[str, Any]] = {}
+        # OrderedDict按访问顺序排列，队首即最久未使用的项
+        self._memory_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self._cache_lock = threading.RLock()
-        self._access_times: Dict[str, float] = {}
         
         # 加载配置
         self._load_config()
@@ -46,10 +73,17 @@ class SmartCache:
         # 确保磁盘缓存目录存在
         os.makedirs(self.storage_path, exist_ok=True)
         
-        print(f"SmartCache initialized: Memory limit={self.max_memory_entries}, Disk path={self.storage_path}")
+        # 磁盘用量计数器，启动时扫描一次，之后随写入/删除增量维护。
+        # 缓存目录由所有worker进程共享，计数器只反映本进程的操作，
+        # 因此查询统计或清理时按间隔重新扫描校准
+        self._disk_bytes = 0
+        self._disk_files = 0
+        self._last_disk_scan = 0.0
+        self._scan_disk_usage()
         
-        # 启动后台清理任务
-        self._start_cleanup_thread()
+        # 读取时已按TTL惰性过期；未再被访问的过期项由调用方（如main.py的lifespan任务）
+        # 按cleanup_interval调用clear_expired_cache回收
+        print(f"SmartCache initialized: Memory limit={self.max_memory_entries}, Disk path={self.storage_path}")
     
     def _load_config(self):
         """加载缓存配置"""
@@ -98,25 +132,47 @@ class SmartCache:
                 # 对DataFrame生成哈希
                 v = self._get_dataframe_hash(v)
             key_parts.append(f"{k}:{v}")
-        return hashlib.md5('_'.join(key_parts).encode()).hexdigest()
+        return _hexdigest('_'.join(key_parts).encode(), digest_size=16)
     
     def _get_dataframe_hash(self, df: pd.DataFrame) -> str:
         """生成DataFrame的哈希值"""
-        if df is None or df.empty:
-            return "empty_df"
-        
-        # 基于数据形状、时间范围、关键价格信息生成哈希
-        hash_components = [
-            f"shape:{df.shape[0]}x{df.shape[1]}",
-            f"start:{df.index[0]}",
-            f"end:{df.index[-1]}",
-        ]
-        
-        # 添加最新价格作为哈希组件
-        if 'close' in df.columns:
-            hash_components.append(f"last_close:{df['close'].iloc[-1]:.4f}")
+        return chart_fingerprint(df)
+    
+    def _scan_disk_usage(self):
+        """遍历磁盘缓存目录，初始化用量计数器"""
+        total_size = 0
+        file_count = 0
+        try:
+            for root, dirs, files in os.walk(self.storage_path):
+                for file in files:
+                    if file.endswith('.cache'):
+                        try:
+                            total_size += os.path.getsize(os.path.join(root, file))
+                        except FileNotFoundError:
+                            # 其他worker在遍历期间删除了该文件
+                            continue
+                        file_count += 1
+        except Exception as e:
+            print(f"Error calculating disk stats: {e}")
         
-        return hashlib.md5('_'.join(hash_components).encode()).hexdigest()[:16]
+        with self._cache_lock:
+            self._disk_bytes = total_size
+            self._disk_files = file_count
+            self._last_disk_scan = time.monotonic()
+    
+    def _refresh_disk_usage(self):
+        """距上次扫描超过DISK_RESCAN_INTERVAL秒时重新扫描，校准其他进程造成的偏差"""
+        if time.monotonic() - self._last_disk_scan >= self.DISK_RESCAN_INTERVAL:
+            self._scan_disk_usage()
+    
+    def _remove_disk_file(self, file_path: str, size: int):
+        """删除磁盘缓存文件并同步用量计数器"""
+        os.remove(file_path)
+        if file_path.endswith('.cache'):
+            with self._cache_lock:
+                # 文件可能由其他进程写入，计数器不能减到负数
+                self._disk_bytes = max(0, self._disk_bytes - size)
+                self._disk_files = max(0, self._disk_files - 1)
     
     def _get_disk_path(self, key: str, cache_type: str) -> str:
         """获取磁盘缓存文件路径"""
@@ -132,61 +188,69 @@ class SmartCache:
     
     def _evict_lru(self):
         """LRU策略清理内存缓存"""
-        if len(self._memory_cache) <= self.max_memory_entries:
-            return
+        num_removed = 0
+        while len(self._memory_cache) > self.max_memory_entries:
+            self._memory_cache.popitem(last=False)
+            num_removed += 1
         
-        # 按访问时间排序，删除最久未使用的项
-        sorted_keys = sorted(self._access_times.items(), key=lambda x: x[1])
-        num_to_remove = len(self._memory_cache) - self.max_memory_entries + 100  # 多删除一些避免频繁清理
-        
-        for key, _ in sorted_keys[:num_to_remove]:
-            self._memory_cache.pop(key, None)
-            self._access_times.pop(key, None)
-        
-        print(f"SmartCache: Evicted {num_to_remove} entries from memory cache")
+        if num_removed:
+            print(f"SmartCache: Evicted {num_removed} entries from memory cache")
     
-    def _cleanup_expired_entries(self):
-        """清理过期的缓存项"""
+    def _cleanup_expired_entries(self) -> int:
+        """清理过期的缓存项，返回清理的项目数"""
         current_time = time.time()
+        # 每种类型的过期阈值只算一次，循环内只剩一次时间戳比较
+        cutoffs = {cache_type: current_time - self._get_ttl_by_type(cache_type)
+                   for cache_type in ('data', 'chart', 'analysis')}
+        default_cutoff = current_time - self._get_ttl_by_type('unknown')
         
         # 清理内存缓存
         with self._cache_lock:
-            expired_keys = []
-            for key, entry in self._memory_cache.items():
-                cache_type = entry.get('type', 'unknown')
-                ttl = self._get_ttl_by_type(cache_type)
-                if self._is_expired(entry, ttl):
-                    expired_keys.append(key)
+            expired_keys = [
+                key for key, entry in self._memory_cache.items()
+                if entry.get('timestamp', float('-inf')) < cutoffs.get(entry.get('type'), default_cutoff)
+            ]
             
             for key in expired_keys:
                 self._memory_cache.pop(key, None)
-                self._access_times.pop(key, None)
         
         # 清理磁盘缓存
-        self._cleanup_disk_cache()
+        removed_files = self._cleanup_disk_cache()
         
         if expired_keys:
             print(f"SmartCache: Cleaned up {len(expired_keys)} expired entries")
+        return len(expired_keys) + removed_files
     
-    def _cleanup_disk_cache(self):
-        """清理磁盘缓存中的过期文件"""
+    def _cleanup_disk_cache(self) -> int:
+        """清理磁盘缓存中的过期文件，返回本进程删除的文件数"""
+        removed = 0
         try:
+            current_time = time.time()
             for cache_type in ['data', 'chart', 'analysis']:
                 cache_dir = os.path.join(self.storage_path, cache_type)
                 if not os.path.exists(cache_dir):
                     continue
                 
-                ttl = self._get_ttl_by_type(cache_type)
-                current_time = time.time()
+                cutoff = current_time - self._get_ttl_by_type(cache_type)
                 
-                for filename in os.listdir(cache_dir):
-                    file_path = os.path.join(cache_dir, filename)
-                    if os.path.isfile(file_path):
-                        # 检查文件修改时间
-                        if current_time - os.path.getmtime(file_path) > ttl:
-                            os.remove(file_path)
+                # scandir的is_file()直接使用目录项类型，每个文件只需一次stat取修改时间
+                with os.scandir(cache_dir) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file():
+                                stat = entry.stat()
+                                if stat.st_mtime < cutoff:
+                                    self._remove_disk_file(entry.path, stat.st_size)
+                                    removed += 1
+                        except FileNotFoundError:
+                            # 缓存目录由多个worker共享，该文件已被其他进程删除，继续清理其余文件
+                            continue
         except Exception as e:
             print(f"Error during disk cache cleanup: {e}")
+        
+        # 清理后重新扫描，校准其他进程写入/删除造成的计数偏差
+        self._refresh_disk_usage()
+        return removed
     
     def _get_ttl_by_type(self, cache_type: str) -> int:
         """根据缓存类型获取TTL"""
@@ -197,17 +261,6 @@ class SmartCache:
         }
         return ttl_map.get(cache_type, 300)
     
-    def _start_cleanup_thread(self):
-        """启动后台清理线程"""
-        def cleanup_worker():
-            while True:
-                time.sleep(self.cleanup_interval)
-                self._cleanup_expired_entries()
-        
-        cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        cleanup_thread.start()
-        print(f"SmartCache: Background cleanup thread started (interval: {self.cleanup_interval}s)")
-    
     def _get_from_memory(self, key: str, cache_type: str) -> Optional[Any]:
         """从内存缓存获取数据"""
         if not self.enabled:
@@ -222,11 +275,10 @@ class SmartCache:
             
             if self._is_expired(entry, ttl):
                 del self._memory_cache[key]
-                self._access_times.pop(key, None)
                 return None
             
-            # 更新访问时间
-            self._access_times[key] = time.time()
+            # 标记为最近使用
+            self._memory_cache.move_to_end(key)
             return entry['data']
     
     def _set_to_memory(self, key: str, data: Any, cache_type: str):
@@ -240,14 +292,17 @@ class SmartCache:
                 'timestamp': time.time(),
                 'type': cache_type
             }
-            self._access_times[key] = time.time()
+            self._memory_cache.move_to_end(key)
             
             # 检查是否需要清理
             if len(self._memory_cache) > self.max_memory_entries:
                 self._evict_lru()
     
-    def _get_from_disk(self, key: str, cache_type: str) -> Optional[Any]:
-        """从磁盘缓存获取数据"""
+    def _get_from_disk(self, key: str, cache_type: str, promote: bool = True) -> Optional[Any]:
+        """
+        从磁盘缓存获取数据
+        promote为False时只读取磁盘，不把数据提升到内存缓存（适用于一次性的管理类读取）
+        """
         if not self.enabled:
             return None
         
@@ -257,15 +312,17 @@ class SmartCache:
                 return None
             
             ttl = self._get_ttl_by_type(cache_type)
-            if time.time() - os.path.getmtime(file_path) > ttl:
-                os.remove(file_path)
+            stat = os.stat(file_path)
+            if time.time() - stat.st_mtime > ttl:
+                self._remove_disk_file(file_path, stat.st_size)
                 return None
             
             with open(file_path, 'rb') as f:
-                data = pickle.load(f)
+                data = self._read_disk_payload(f)
             
             # 将数据加载到内存缓存
-            self._set_to_memory(key, data, cache_type)
+            if promote:
+                self._set_to_memory(key, data, cache_type)
             return data
         
         except Exception as e:
@@ -279,14 +336,71 @@ class SmartCache:
         
         try:
             file_path = self._get_disk_path(key, cache_type)
-            with open(file_path, 'wb') as f:
-                pickle.dump(data, f)
+            # 先写入本线程独占的临时文件，锁内只做探测、改名和计数，
+            # 同一key的并发写入不会都被计为新文件，读者也不会看到写了一半的文件
+            tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    self._write_disk_payload(f, data)
+                    f.flush()
+                    new_size = os.fstat(f.fileno()).st_size
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            
+            with self._cache_lock:
+                try:
+                    previous_size = os.path.getsize(file_path)
+                except FileNotFoundError:
+                    previous_size = None
+                os.replace(tmp_path, file_path)
+                if previous_size is None:
+                    self._disk_files += 1
+                else:
+                    self._disk_bytes = max(0, self._disk_bytes - previous_size)
+                self._disk_bytes += new_size
         except Exception as e:
             print(f"Error writing to disk cache {key}: {e}")
     
+    def _write_disk_payload(self, f, data: Any):
+        """
+        按数据类型选择磁盘序列化格式
+        - DataFrame: zstd压缩的feather
+        - bytes (图表PNG，本身已压缩): 原样写入
+        - 其他: pickle
+        """
+        if isinstance(data, pd.DataFrame) and feather is not None:
+            # feather footer中的偏移量基于流起点，先写入内存缓冲区再拼接文件头
+            buffer = io.BytesIO()
+            feather.write_feather(data, buffer, compression='zstd', compression_level=1)
+            f.write(_MAGIC_FEATHER)
+            f.write(buffer.getbuffer())
+        elif isinstance(data, bytes):
+            f.write(_MAGIC_RAW)
+            f.write(data)
+        else:
+            f.write(_MAGIC_PICKLE)
+            pickle.dump(data, f)
+    
+    def _read_disk_payload(self, f) -> Any:
+        """根据文件头反序列化磁盘缓存，无文件头的旧缓存按pickle读取"""
+        magic = f.read(_MAGIC_LEN)
+        if magic == _MAGIC_FEATHER:
+            if feather is None:
+                raise RuntimeError("pyarrow is required to read feather cache entries")
+            return feather.read_feather(io.BytesIO(f.read()))
+        if magic == _MAGIC_RAW:
+            return f.read()
+        if magic != _MAGIC_PICKLE:
+            f.seek(0)
+        return pickle.load(f)
+    
     # 公共API方法
     
-    def get_data_cache(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+    def get_data_cache(self, symbol: str, interval: str, promote: bool = True) -> Optional[pd.DataFrame]:
         """获取数据缓存"""
         key = self._generate_key('data', symbol=symbol, interval=interval)
         
@@ -297,7 +411,7 @@ class SmartCache:
             return data
         
         # 尝试磁盘缓存
-        data = self._get_from_disk(key, 'data')
+        data = self._get_from_disk(key, 'data', promote=promote)
         if data is not None:
             print(f"SmartCache: Data cache HIT (disk) for {symbol}_{interval}")
             return data
@@ -315,7 +429,7 @@ class SmartCache:
         self._set_to_disk(key, data, 'data')
         print(f"SmartCache: Data cached for {symbol}_{interval}")
     
-    def get_chart_cache(self, symbol: str, interval: str, data_hash: str) -> Optional[bytes]:
+    def get_chart_cache(self, symbol: str, interval: str, data_hash: str, promote: bool = True) -> Optional[bytes]:
         """获取图表缓存"""
         key = self._generate_key('chart', symbol=symbol, interval=interval, data_hash=data_hash)
         
@@ -326,7 +440,7 @@ class SmartCache:
             return data
         
         # 尝试磁盘缓存
-        data = self._get_from_disk(key, 'chart')
+        data = self._get_from_disk(key, 'chart', promote=promote)
         if data is not None:
             print(f"SmartCache: Chart cache HIT (disk) for {symbol}_{interval}")
             return data
@@ -344,7 +458,7 @@ class SmartCache:
         self._set_to_disk(key, chart_bytes, 'chart')
         print(f"SmartCache: Chart cached for {symbol}_{interval}")
     
-    def get_analysis_cache(self, symbol: str, data_hash: str) -> Optional[str]:
+    def get_analysis_cache(self, symbol: str, data_hash: str, promote: bool = True) -> Optional[str]:
         """获取AI分析缓存"""
         key = self._generate_key('analysis', symbol=symbol, data_hash=data_hash)
         
@@ -355,7 +469,7 @@ class SmartCache:
             return data
         
         # 尝试磁盘缓存
-        data = self._get_from_disk(key, 'analysis')
+        data = self._get_from_disk(key, 'analysis', promote=promote)
         if data is not None:
             print(f"SmartCache: Analysis cache HIT (disk) for {symbol}")
             return data
@@ -375,6 +489,7 @@ class SmartCache:
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
+        self._refresh_disk_usage()
         with self._cache_lock:
             memory_stats = {
                 'total_entries': len(self._memory_cache),
@@ -382,25 +497,12 @@ class SmartCache:
                 'usage_percent': (len(self._memory_cache) / self.max_memory_entries) * 100
             }
         
-        # 磁盘使用统计
-        disk_stats = {'total_size_mb': 0, 'file_count': 0}
-        try:
-            if os.path.exists(self.storage_path):
-                total_size = 0
-                file_count = 0
-                for root, dirs, files in os.walk(self.storage_path):
-                    for file in files:
-                        if file.endswith('.cache'):
-                            file_count += 1
-                            total_size += os.path.getsize(os.path.join(root, file))
-                
-                disk_stats = {
-                    'total_size_mb': round(total_size / (1024 * 1024), 2),
-                    'file_count': file_count,
-                    'max_size_mb': self.max_disk_size_mb
-                }
-        except Exception as e:
-            print(f"Error calculating disk stats: {e}")
+            # 磁盘使用统计（基于增量维护的计数器，最多每DISK_RESCAN_INTERVAL秒重新扫描一次目录）
+            disk_stats = {
+                'total_size_mb': round(self._disk_bytes / (1024 * 1024), 2),
+                'file_count': self._disk_files,
+                'max_size_mb': self.max_disk_size_mb
+            }
         
         return {
             'enabled': self.enabled,
@@ -416,29 +518,8 @@ class SmartCache:
     def clear_expired_cache(self) -> int:
         """清理过期缓存，返回清理的项目数"""
         print("SmartCache: Starting manual cache cleanup...")
-        initial_memory_count = len(self._memory_cache)
-        
-        # 获取磁盘文件数量
-        initial_disk_count = 0
-        try:
-            if os.path.exists(self.storage_path):
-                for root, dirs, files in os.walk(self.storage_path):
-                    initial_disk_count += len([f for f in files if f.endswith('.cache')])
-        except Exception:
-            pass
-        
-        self._cleanup_expired_entries()
-        
-        final_memory_count = len(self._memory_cache)
-        final_disk_count = 0
-        try:
-            if os.path.exists(self.storage_path):
-                for root, dirs, files in os.walk(self.storage_path):
-                    final_disk_count += len([f for f in files if f.endswith('.cache')])
-        except Exception:
-            pass
-        
-        cleared_count = (initial_memory_count - final_memory_count) + (initial_disk_count - final_disk_count)
+        # 直接统计本次删除的项目，计数器会被重新扫描校准，不能用前后差值
+        cleared_count = self._cleanup_expired_entries()
         print(f"SmartCache: Cleared {cleared_count} expired entries")
         return cleared_count
     
@@ -452,7 +533,6 @@ class SmartCache:
         with self._cache_lock:
             total_cleared += len(self._memory_cache)
             self._memory_cache.clear()
-            self._access_times.clear()
         
         # 清空磁盘缓存
         try:
@@ -463,15 +543,15 @@ class SmartCache:
         except Exception as e:
             print(f"Error clearing disk cache: {e}")
         
+        # 目录可能只被部分删除，重新扫描以校准计数器
+        self._scan_disk_usage()
+        
         print(f"SmartCache: Cleared {total_cleared} total entries")
         return total_cleared
 
-# 全局缓存实例
-_cache_instance = None
+# 全局缓存实例（模块导入时创建，由导入锁保证唯一）
+cache = SmartCache()
 
 def get_cache() -> SmartCache:
     """获取全局缓存实例"""
-    global _cache_instance
-    if _cache_instance is None:
-        _cache_instance = SmartCache()
-    return _cache_instance 
\ No newline at end of file
+    return cache 
\ No newline at end of file
@@ -1,16 +1,45 @@
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 
 # Path to the SQLite database file
 DB_PATH = Path(__file__).resolve().parent / "reports.db"
 
+# 每个线程复用一条已配置好的连接，避免每次调用都重新打开数据库、读取文件头
+_local = threading.local()
+
+
+def _connect(**kwargs) -> sqlite3.Connection:
+    """
+    打开数据库连接并设置 PRAGMA。
+    WAL 模式允许读取与写入并发进行，synchronous=NORMAL 在 WAL 下仍能保证数据库一致性。
+    """
+    conn = sqlite3.connect(DB_PATH, **kwargs)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    获取当前线程的共享连接（首次调用时创建）。
+    sqlite3 连接不能安全地在线程间并发使用，因此按线程而不是全局共享。
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+    return conn
+
 
 def init_db() -> None:
     """
     初始化 SQLite 数据库，创建 reports 表。
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute("""
     CREATE TABLE IF NOT EXISTS reports (
@@ -29,8 +58,9 @@ def init_db() -> None:
     )
     """
     )
+    # 过期清理按 generated_at 范围查询
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_generated_at ON reports(generated_at)")
     conn.commit()
-    conn.close()
 
 
 def insert_report(
@@ -49,7 +79,7 @@ def insert_report(
     """
     向 reports 表插入一条新的报告记录。
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     c.execute(
         """
@@ -66,21 +96,15 @@ def insert_report(
         )
     )
     conn.commit()
-    conn.close()
 
 
-def get_reports(
-    user_id: Optional[str] = None,
-    date: Optional[str] = None
-) -> List[Dict[str, Any]]:
+def _build_reports_query(
+    user_id: Optional[str],
+    date: Optional[str]
+) -> Tuple[str, List[Any]]:
     """
-    查询报告记录，可选根据 user_id 和生成日期过滤。
-    日期格式应为 YYYY-MM-DD。
-    返回列表，每项为 dict。
+    根据 user_id 和生成日期构造查询语句与参数。
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
     query = "SELECT * FROM reports WHERE 1=1"
     params: List[Any] = []
     if user_id:
@@ -90,8 +114,60 @@ def get_reports(
         # 匹配开始为 date 的 generated_at
         query += " AND generated_at LIKE ?"
         params.append(f"{date}%")
+    return query, params
+
+
+def get_reports(
+    user_id: Optional[str] = None,
+    date: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    查询报告记录，可选根据 user_id 和生成日期过滤。
+    日期格式应为 YYYY-MM-DD。
+    返回列表，每项为 dict。
+    """
+    c = get_connection().cursor()
+    query, params = _build_reports_query(user_id, date)
     c.execute(query, params)
     rows = c.fetchall()
-    conn.close()
     # 转换为普通 dict 返回
-    return [dict(row) for row in rows] 
\ No newline at end of file
+    return [dict(row) for row in rows]
+
+
+def get_reports_version(
+    user_id: Optional[str] = None,
+    date: Optional[str] = None
+) -> Tuple[Optional[int], int]:
+    """
+    返回与 get_reports 相同过滤条件下的 (最大id, 记录数)。
+    id 自增，新增记录会改变最大id，删除记录会改变记录数，可作为结果集的版本号。
+    """
+    query, params = _build_reports_query(user_id, date)
+    query = query.replace("SELECT *", "SELECT MAX(id), COUNT(*)", 1)
+    max_id, count = get_connection().execute(query, params).fetchone()
+    return max_id, count
+
+
+def iter_reports(
+    user_id: Optional[str] = None,
+    date: Optional[str] = None,
+    batch_size: int = 500
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    与 get_reports 过滤条件相同，但按批次逐步产出 dict 列表，
+    结果集再大内存占用也只有一个批次。
+    生成器可能在不同线程中被推进（如流式响应的线程池），不能借用线程共享连接，
+    因此使用独立连接并关闭同线程检查；该连接只被这一个消费者顺序使用。
+    """
+    conn = _connect(check_same_thread=False)
+    try:
+        c = conn.cursor()
+        query, params = _build_reports_query(user_id, date)
+        c.execute(query, params)
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(row) for row in rows]
+    finally:
+        conn.close()
@@ -1,12 +1,13 @@
 # config/settings.py
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
-import os
 from dotenv import load_dotenv
 
-# Explicitly load .env from the current working directory or parent directories.
-# override=True ensures .env vars take precedence over existing env vars if they are also in the environment.
-load_dotenv(verbose=True, override=True)
+# The single place .env is loaded. Other modules import this one instead of
+# calling load_dotenv themselves; os.environ is also inherited by the CLI
+# subprocesses the orchestrator spawns.
+load_dotenv()
 
 class Settings(BaseSettings):
     APP_NAME: str = "Project Alpha AI Technical Analysis Service"
@@ -31,8 +32,13 @@ class Settings(BaseSettings):
         extra='ignore'
     )
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the process-wide Settings; .env is parsed and validated only once."""
+    return Settings()
+
 # Instantiate settings to be imported by other modules
-settings = Settings()
+settings = get_settings()
 
 # Simple startup checks for essential keys
 if not settings.FMP_API_KEY:
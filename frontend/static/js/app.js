@@ -165,15 +165,15 @@ document.addEventListener('DOMContentLoaded', () => {
 
     /**
      * Displays the final analysis report image.
-     * @param {object} data The API response data, containing the image.
+     * @param {object} data The API response data, containing the image URL.
      */
     function displayAnalysis(data) {
         const messageDiv = document.createElement('div');
         messageDiv.className = 'message ai-message';
 
-        if (data.image) {
+        if (data.image_url) {
             const img = document.createElement('img');
-            img.src = `data:image/png;base64,${data.image}`;
+            img.src = data.image_url;
             img.alt = "Analysis Report";
             messageDiv.appendChild(img);
         } else {
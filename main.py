@@ -1,35 +1,129 @@
-import base64
+import asyncio
+import functools
+import logging
 import os
+import queue
+import stat
 import sys
-from fastapi import FastAPI, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from anyio import to_thread
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
-from pydantic import BaseModel
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
-from dotenv import load_dotenv
+from config.settings import settings  # noqa: F401  # loads .env once, before the backend modules read it
 from backend.core.orchestrator import AnalysisOrchestrator
-from backend.db.reports import get_reports
+from backend.core.performance_monitor import get_monitor
+from backend.db.reports import get_reports_version, iter_reports
+from backend.core.smart_cache import get_cache
 
-# Load environment variables from .env file.
-# This should be at the top to ensure they are loaded for all modules.
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# 报告图片路径带时间戳且生成后不再改写，可以放心让浏览器缓存
+REPORT_IMAGE_CACHE_CONTROL = "public, max-age=86400, immutable"
+
+# 默认线程池大小：线程里跑的主要是等待网络（FMP抓数）和Playwright/子进程I/O的步骤，大多在阻塞等待，
+# 因此不按核数取值。每个报告同一时刻约占2个线程，默认64个约可同时推进32个报告
+# （asyncio自带的min(32, 核数+4)在2核容器上只有6个）；Starlette文件读取走单独的anyio线程池
+EXECUTOR_MAX_WORKERS = int(os.getenv("EXECUTOR_MAX_WORKERS", "64"))
+
+# anyio线程池令牌数（Starlette的文件读取、静态文件都走它，默认40个在突发并发下会排队卡住）
+ANYIO_THREAD_LIMIT = int(os.getenv("ANYIO_THREAD_LIMIT", "200"))
 
 # With main.py at the root, we no longer need to manipulate sys.path.
 # Python and Uvicorn will handle it correctly.
 
-app = FastAPI()
+async def _periodic_cache_cleanup():
+    """
+    定期回收未再被访问的过期缓存（被访问的条目在读取时已按TTL惰性过期）
+    """
+    cache = get_cache()
+    while True:
+        await asyncio.sleep(cache.cleanup_interval)
+        try:
+            await asyncio.to_thread(cache.clear_expired_cache)
+        except Exception as e:
+            logger.warning("Periodic cache cleanup failed: %s", e)
+
+@functools.lru_cache(maxsize=None)
+def get_orchestrator() -> AnalysisOrchestrator:
+    """
+    返回进程内共享的AnalysisOrchestrator（初始化数据库、LLM客户端和图表模板只需一次）
+    """
+    return AnalysisOrchestrator()
+
+@functools.lru_cache(maxsize=None)
+def _instruction_validator():
+    """
+    首次使用时导入一次指令验证模块（它在导入时检查DEEPSEEK_API_KEY，缺少密钥不应阻止应用启动），
+    之后各请求直接复用模块对象，不再逐次执行import语句
+    """
+    from backend.core import instruction_validator
+    return instruction_validator
+
+def _start_log_listener() -> QueueListener:
+    """
+    请求路径上的logger调用只做一次入队，格式化和写stdout由后台监听线程完成，不阻塞事件循环
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+def _stop_log_listener(listener: QueueListener):
+    """停止监听线程（会先处理完队列中剩余的日志），并移除队列handler"""
+    listener.stop()
+    for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(handler)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = _start_log_listener()
+    executor = ThreadPoolExecutor(max_workers=EXECUTOR_MAX_WORKERS)
+    asyncio.get_running_loop().set_default_executor(executor)
+    to_thread.current_default_thread_limiter().total_tokens = ANYIO_THREAD_LIMIT
+    get_orchestrator()
+    _warm_up_models()
+    # 首页是静态文件，启动时读入内存，避免每次访问都stat+读盘
+    with open("frontend/index.html", "r", encoding="utf-8") as f:
+        app.state.index_html = f.read()
+    cleanup_task = asyncio.create_task(_periodic_cache_cleanup())
+    yield
+    cleanup_task.cancel()
+    executor.shutdown(wait=False)
+    _stop_log_listener(log_listener)
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # --- Pydantic Models ---
+# 请求模型：不可变且拒绝未知字段，pydantic-core可走最简单的校验路径，也不会为多余字段分配内存
+_REQUEST_MODEL_CONFIG = ConfigDict(extra="forbid", frozen=True)
+
 class AnalysisRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     ticker: str
     interval: str
     num_candles: int = 150
     exchange: Optional[str] = None
 
 class AnalysisResponse(BaseModel):
-    image: str
+    report_id: str
+    image_url: str
+    analysis_text: Optional[str] = None
 
 class InstructionValidationRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     user_input: str
 
 class InstructionValidationResponse(BaseModel):
@@ -68,14 +162,45 @@ class PerformanceStatsResponse(BaseModel):
     cache_stats: Dict[str, Dict[str, int]]
     operations: Dict[str, Dict[str, Any]]
 
+def _build_analysis_response(final_report_path: str, analysis_text: Optional[str]) -> ORJSONResponse:
+    """
+    报告图片通过独立的GET端点以文件形式下发，这里只返回报告ID、图片URL和分析文本
+    直接返回Response对象，跳过FastAPI的二次校验和序列化（AnalysisResponse仅用于接口文档）
+    """
+    report_dir = os.path.dirname(os.path.abspath(final_report_path))
+    output_dir = os.path.abspath(get_orchestrator().output_dir)
+    report_id = os.path.relpath(report_dir, output_dir).replace(os.sep, "/")
+
+    return ORJSONResponse({
+        "report_id": report_id,
+        "image_url": f"/api/analyze/{report_id}/{os.path.basename(final_report_path)}",
+        "analysis_text": analysis_text
+    })
+
+def _warm_up_models() -> None:
+    """
+    Pydantic v2在类定义时已编译校验器，这里用示例数据各跑一次校验/序列化，
+    让首个请求不再承担首次调用的开销
+    """
+    AnalysisRequest.model_validate({"ticker": "AAPL", "interval": "1d"})
+    InstructionValidationRequest.model_validate({"user_input": "AAPL 1d"})
+    InstructionValidationResponse.model_validate({"status": "valid", "command": "AAPL 1d 150"}).model_dump()
+
+class ReportImageResponse(FileResponse):
+    """
+    FileResponse每读一块都要经线程池跳转一次；报告图片只有几百KB，
+    用1MB的块通常一次读完，省掉逐块(默认64KB)的线程切换
+    """
+    chunk_size = 1024 * 1024
+
 # --- Static Files & Frontend Serving ---
 # Paths are now relative to the project root where main.py is located.
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 
 @app.get("/", response_class=HTMLResponse)
-async def read_root():
+async def read_root(request: Request):
     """Serve the main HTML file."""
-    return FileResponse("frontend/index.html")
+    return HTMLResponse(request.app.state.index_html)
 
 # --- API Endpoints ---
 @app.post("/api/validate_instruction", response_model=InstructionValidationResponse)
@@ -83,9 +208,7 @@ async def validate_instruction(request: InstructionValidationRequest):
     """
     Validates, corrects, or asks for clarification on a user's instruction using an LLM.
     """
-    from backend.core.instruction_validator import validate_and_extract_command
-    
-    response = await validate_and_extract_command(request.user_input)
+    response = await _instruction_validator().validate_and_extract_command(request.user_input)
     return response
 
 @app.get("/api/instruction/cache/stats")
@@ -94,8 +217,7 @@ async def get_instruction_cache_stats():
     获取指令缓存统计信息，用于监控优化效果
     """
     try:
-        from backend.core.instruction_validator import get_cache_stats
-        stats = get_cache_stats()
+        stats = _instruction_validator().get_cache_stats()
         return {"success": True, "cache_stats": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get instruction cache stats: {str(e)}")
@@ -106,24 +228,21 @@ async def clear_instruction_cache():
     清空指令缓存（调试用）
     """
     try:
-        from backend.core.instruction_validator import clear_instruction_cache
-        clear_instruction_cache()
+        _instruction_validator().clear_instruction_cache()
         return {"success": True, "message": "Instruction cache cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear instruction cache: {str(e)}")
 
-@app.post("/api/smart_analyze", response_model=AnalysisResponse)
+@app.post("/api/smart_analyze", responses={200: {"model": AnalysisResponse}})
 async def smart_analyze(request: InstructionValidationRequest):
     """
     智能分析端点：接受自然语言输入，自动验证指令并生成分析报告
     结合了指令验证和数据分析的完整流程
     """
     try:
-        from backend.core.instruction_validator import validate_and_extract_command
-        
         # Step 1: 验证和解析指令
-        print(f"正在理解指令: {request.user_input}")
-        validation_result = await validate_and_extract_command(request.user_input)
+        logger.info("正在理解指令: %s", request.user_input)
+        validation_result = await _instruction_validator().validate_and_extract_command(request.user_input)
         
         if validation_result["status"] != "valid":
             raise HTTPException(
@@ -152,12 +271,12 @@ async def smart_analyze(request: InstructionValidationRequest):
             interval = parts[1]
             num_candles = int(parts[2])
         
-        print(f"解析后参数: ticker={ticker}, exchange={exchange}, interval={interval}, num_candles={num_candles}")
+        logger.info("解析后参数: ticker=%s, exchange=%s, interval=%s, num_candles=%s", ticker, exchange, interval, num_candles)
         
         # Step 3: 执行分析
-        orchestrator = AnalysisOrchestrator()
+        orchestrator = get_orchestrator()
         
-        final_report_path, message = await orchestrator.generate_report(
+        final_report_path, analysis_text, message = await orchestrator.generate_report_with_analysis(
             ticker=ticker,
             interval=interval,
             num_candles=num_candles,
@@ -165,82 +284,116 @@ async def smart_analyze(request: InstructionValidationRequest):
         )
         
         # 检查报告是否成功生成
-        if not final_report_path or not os.path.exists(final_report_path):
+        if not final_report_path:
             error_msg = message if message and "failed" in message.lower() else "Final report image not found"
-            print(f"An error occurred: {error_msg}")
+            logger.error("An error occurred: %s", error_msg)
             raise HTTPException(status_code=500, detail=f"Report generation failed: {error_msg}")
         
         # 成功生成报告
-        print(f"Report generated successfully: {message}")
+        logger.info("Report generated successfully: %s", message)
 
-        with open(final_report_path, "rb") as image_file:
-            image_base64_str = base64.b64encode(image_file.read()).decode("utf-8")
-
-        return AnalysisResponse(image=image_base64_str)
+        return _build_analysis_response(final_report_path, analysis_text)
         
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        print(f"An unexpected error occurred in /api/smart_analyze: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("An unexpected error occurred in /api/smart_analyze: %s", e)
         raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
 
-@app.post("/api/analyze", response_model=AnalysisResponse)
+@app.post("/api/analyze", responses={200: {"model": AnalysisResponse}})
 async def analyze(request: AnalysisRequest):
-    print(f"Received analysis request for: {request.ticker} on exchange {request.exchange or 'default'} ({request.interval})")
+    logger.info("Received analysis request for: %s on exchange %s (%s)", request.ticker, request.exchange or 'default', request.interval)
     try:
-        orchestrator = AnalysisOrchestrator()
+        orchestrator = get_orchestrator()
         
-        final_report_path, message = await orchestrator.generate_report(
+        final_report_path, analysis_text, message = await orchestrator.generate_report_with_analysis(
             ticker=request.ticker,
             interval=request.interval,
             num_candles=request.num_candles,
             exchange=request.exchange
         )
         
-        # 检查报告是否成功生成（基于文件路径而不是消息）
-        if not final_report_path or not os.path.exists(final_report_path):
+        # 检查报告是否成功生成（orchestrator已确认文件存在）
+        if not final_report_path:
             error_msg = message if message and "failed" in message.lower() else "Final report image not found"
-            print(f"An error occurred: {error_msg}")
+            logger.error("An error occurred: %s", error_msg)
             raise HTTPException(status_code=500, detail=f"Report generation failed: {error_msg}")
         
         # 成功生成报告
-        print(f"Report generated successfully: {message}")
-
-        with open(final_report_path, "rb") as image_file:
-            image_base64_str = base64.b64encode(image_file.read()).decode("utf-8")
+        logger.info("Report generated successfully: %s", message)
 
-        return AnalysisResponse(image=image_base64_str)
+        return _build_analysis_response(final_report_path, analysis_text)
         
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        print(f"An unexpected error occurred in /api/analyze: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("An unexpected error occurred in /api/analyze: %s", e)
         raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
 
-@app.get("/api/analysis/history", response_model=List[ReportMetadata])
-async def get_history(user_id: Optional[str] = None, date: Optional[str] = None):
+@app.get("/api/analyze/{report_date}/{report_name}/{filename}")
+async def get_report_image(report_date: str, report_name: str, filename: str, request: Request):
+    """
+    以文件形式返回已生成的报告图片（直接下发原始字节，无需base64编码）
+    报告生成后不会再被改写，因此带上ETag并允许浏览器长期缓存，重复请求直接返回304
+    """
+    output_dir = os.path.abspath(get_orchestrator().output_dir)
+    image_path = os.path.abspath(os.path.join(output_dir, report_date, report_name, filename))
+    # 防止路径穿越到报告目录之外，并且只下发最终报告图片
+    if os.path.commonpath([output_dir, image_path]) != output_dir or not filename.startswith("final_report."):
+        raise HTTPException(status_code=404, detail="Report image not found")
+    # 一次stat同时完成存在性检查和ETag所需的元数据
+    try:
+        stat_result = os.stat(image_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Report image not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Report image not found")
+
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {"ETag": etag, "Cache-Control": REPORT_IMAGE_CACHE_CONTROL}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return ReportImageResponse(image_path, headers=headers, stat_result=stat_result)
+
+def _iter_history_json(user_id: Optional[str], date: Optional[str]):
+    """
+    以JSON数组的形式逐批产出历史记录，每批整体交给orjson序列化
+    """
+    yield b"["
+    first = True
+    for batch in iter_reports(user_id, date):
+        chunk = b",".join(orjson.dumps(row) for row in batch)
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+@app.get("/api/analysis/history", responses={200: {"model": List[ReportMetadata]}})
+async def get_history(request: Request, user_id: Optional[str] = None, date: Optional[str] = None):
     """
     列出历史报告。可根据 user_id 和日期(YYYY-MM-DD) 过滤。
+    数据库行的字段与ReportMetadata一致，直接序列化返回，跳过逐行的模型校验；
+    结果按批流式输出，内存占用与记录总数无关（同步生成器由Starlette放到线程池推进，不阻塞事件循环）。
+    ETag由结果集的最大id和记录数构成，结果未变化的轮询直接返回304（版本查询同样放到线程里执行）
     """
-    records = get_reports(user_id, date)
-    return records
+    max_id, count = await asyncio.to_thread(get_reports_version, user_id, date)
+    etag = f'W/"{max_id or 0:x}-{count:x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(_iter_history_json(user_id, date), media_type="application/json", headers=headers)
 
 # --- 缓存管理API端点 ---
 
-@app.get("/api/cache/stats", response_model=CacheStatsResponse)
+@app.get("/api/cache/stats", responses={200: {"model": CacheStatsResponse}})
 async def get_cache_stats():
     """
     获取缓存统计信息：命中率、存储大小、条目数量
     """
     try:
-        from backend.core.smart_cache import get_cache
         cache = get_cache()
-        stats = cache.get_cache_stats()
-        return CacheStatsResponse(**stats)
+        # 统计可能触发限频的磁盘目录重新扫描，放到线程里执行
+        stats = await asyncio.to_thread(cache.get_cache_stats)
+        return ORJSONResponse(stats)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get cache stats: {str(e)}")
 
@@ -250,9 +403,9 @@ async def clear_expired_cache():
     清理过期缓存，返回清理的条目数
     """
     try:
-        from backend.core.smart_cache import get_cache
         cache = get_cache()
-        cleared_count = cache.clear_expired_cache()
+        # 遍历/删除缓存目录是阻塞的磁盘操作，放到线程里执行，避免阻塞事件循环
+        cleared_count = await asyncio.to_thread(cache.clear_expired_cache)
         return CacheOperationResponse(
             success=True,
             message=f"Successfully cleared {cleared_count} expired cache entries",
@@ -270,9 +423,9 @@ async def clear_all_cache():
     清空所有缓存（开发调试用）
     """
     try:
-        from backend.core.smart_cache import get_cache
         cache = get_cache()
-        cleared_count = cache.clear_all_cache()
+        # 遍历/删除缓存目录是阻塞的磁盘操作，放到线程里执行，避免阻塞事件循环
+        cleared_count = await asyncio.to_thread(cache.clear_all_cache)
         return CacheOperationResponse(
             success=True,
             message=f"Successfully cleared all cache ({cleared_count} entries)",
@@ -286,16 +439,15 @@ async def clear_all_cache():
 
 # --- 性能监控API端点 ---
 
-@app.get("/api/performance/stats", response_model=PerformanceStatsResponse)
+@app.get("/api/performance/stats", responses={200: {"model": PerformanceStatsResponse}})
 async def get_performance_stats():
     """
     获取详细的性能统计信息
     """
     try:
-        from backend.core.performance_monitor import get_monitor
         monitor = get_monitor()
         stats = monitor.get_performance_stats()
-        return PerformanceStatsResponse(**stats)
+        return ORJSONResponse(stats)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get performance stats: {str(e)}")
 
@@ -305,7 +457,6 @@ async def get_performance_report():
     生成可读的性能报告
     """
     try:
-        from backend.core.performance_monitor import get_monitor
         monitor = get_monitor()
         report = monitor.generate_report()
         return {"report": report}
@@ -318,7 +469,6 @@ async def reset_performance_stats():
     重置性能统计数据
     """
     try:
-        from backend.core.performance_monitor import get_monitor
         monitor = get_monitor()
         monitor.reset_stats()
         return {"success": True, "message": "Performance statistics reset successfully"}
@@ -333,13 +483,10 @@ async def health_check():
     系统健康检查，包括缓存和性能监控状态
     """
     try:
-        from backend.core.smart_cache import get_cache
-        from backend.core.performance_monitor import get_monitor
-        
         cache = get_cache()
         monitor = get_monitor()
         
-        cache_stats = cache.get_cache_stats()
+        cache_stats = await asyncio.to_thread(cache.get_cache_stats)
         hit_rates = monitor.get_cache_hit_rates()
         
         return {
@@ -364,4 +511,6 @@ async def health_check():
 
 # To run this app (from the project_alpha directory):
 # Ensure .venv is activated: source .venv/bin/activate (or .venv\Scripts\activate on Windows)
-# Then run: uvicorn backend.main:app --reload 
\ No newline at end of file
+# Then run: uvicorn main:app --reload
+# Production: uvicorn main:app --host 0.0.0.0 --port 8000 --workers $(nproc) --loop uvloop --http httptools
+# Each worker keeps its own in-memory cache; the disk cache under cache_data/ is shared. 
\ No newline at end of file
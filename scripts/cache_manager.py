@@ -14,25 +14,35 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 def get_cache_size(cache_dir="cache_data"):
-    """计算缓存目录总大小"""
+    """计算缓存目录总大小（scandir复用目录项信息，每个文件只需一次stat）"""
     total_size = 0
-    if os.path.exists(cache_dir):
-        for dirpath, dirnames, filenames in os.walk(cache_dir):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                total_size += os.path.getsize(filepath)
+    stack = [cache_dir]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        total_size += entry.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    # 列出目录后文件被删除（如应用正在清理），跳过该文件，继续统计其余文件
+                    continue
     return total_size
 
+SIZE_NAMES = ("B", "KB", "MB", "GB")
+
 def format_size(size_bytes):
     """格式化文件大小显示"""
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0 B"
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    return f"{size_bytes:.1f} {size_names[i]}"
+    # 每 1024 倍对应 10 个二进制位，由位长直接算出单位，无需循环除法
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(SIZE_NAMES) - 1)
+    return f"{size_bytes / (1 << (i * 10)):.1f} {SIZE_NAMES[i]}"
 
 def count_cache_files(cache_dir="cache_data"):
     """计算缓存文件数量"""
@@ -43,12 +53,34 @@ def count_cache_files(cache_dir="cache_data"):
     
     for category in ["data", "chart", "analysis"]:
         category_dir = os.path.join(cache_dir, category)
-        if os.path.exists(category_dir):
-            counts[category] = len([f for f in os.listdir(category_dir) if f.endswith('.cache')])
+        try:
+            with os.scandir(category_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.cache'):
+                        counts[category] += 1
+        except FileNotFoundError:
+            pass
     
     counts["total"] = sum(counts[k] for k in ["data", "chart", "analysis"])
     return counts
 
+def _clear_category(category_dir):
+    """单次scandir遍历删除类别目录下的.cache文件，返回删除数量
+
+    目录不存在时scandir抛出FileNotFoundError，由调用方处理
+    """
+    cleared_count = 0
+    with os.scandir(category_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.cache'):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    # 已被并发删除（如应用的定期清理），目标已达成，同样计为已清理
+                    pass
+                cleared_count += 1
+    return cleared_count
+
 def clear_cache(cache_dir="cache_data", category=None):
     """清理缓存
     
@@ -65,23 +97,19 @@ def clear_cache(cache_dir="cache_data", category=None):
     if category:
         # 清理特定类别
         category_dir = os.path.join(cache_dir, category)
-        if os.path.exists(category_dir):
-            files = [f for f in os.listdir(category_dir) if f.endswith('.cache')]
-            for file in files:
-                os.remove(os.path.join(category_dir, file))
-                cleared_count += 1
+        try:
+            cleared_count = _clear_category(category_dir)
             print(f"✅ 清理了 {category} 缓存: {cleared_count} 个文件")
-        else:
+        except FileNotFoundError:
             print(f"❌ 类别目录不存在: {category_dir}")
     else:
         # 清理所有缓存
         for category in ["data", "chart", "analysis"]:
             category_dir = os.path.join(cache_dir, category)
-            if os.path.exists(category_dir):
-                files = [f for f in os.listdir(category_dir) if f.endswith('.cache')]
-                for file in files:
-                    os.remove(os.path.join(category_dir, file))
-                    cleared_count += 1
+            try:
+                cleared_count += _clear_category(category_dir)
+            except FileNotFoundError:
+                pass
         print(f"✅ 清理了所有缓存: {cleared_count} 个文件")
     
     return cleared_count
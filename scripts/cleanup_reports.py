@@ -11,43 +11,41 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 from datetime import datetime, timedelta
-from backend.db.reports import DB_PATH
-import sqlite3
+from zoneinfo import ZoneInfo
+from backend.db.reports import get_connection
 
 
 def cleanup(days_to_keep: int = 7):
-    # 计算日期阈值
-    cutoff = datetime.now() - timedelta(days=days_to_keep)
-    cutoff_ts = cutoff.timestamp()
+    # 计算日期阈值。generated_at 是报告生成时间的权威记录，
+    # 以北京时间 "%Y-%m-%d %H:%M:%S" 存储，可按字符串比较并命中索引，无需逐个stat文件
+    cutoff_str = (datetime.now(ZoneInfo("Asia/Shanghai")) - timedelta(days=days_to_keep)).strftime("%Y-%m-%d %H:%M:%S")
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
-    # 获取所有报告记录
-    c.execute("SELECT id, filepath FROM reports")
+    # 只取出过期候选记录，未过期的大多数记录不进入Python
+    c.execute("SELECT id, filepath FROM reports WHERE generated_at < ?", (cutoff_str,))
     rows = c.fetchall()
 
-    deleted = 0
+    expired_ids = []
     for report_id, filepath in rows:
         try:
-            # 检查文件修改时间
-            if os.path.exists(filepath):
-                mtime = os.path.getmtime(filepath)
-                if mtime < cutoff_ts:
-                    os.remove(filepath)
-                    # 尝试删除父目录，如果空则删除
-                    parent_dir = os.path.dirname(filepath)
-                    if os.path.isdir(parent_dir) and not os.listdir(parent_dir):
-                        os.rmdir(parent_dir)
-                    # 从数据库中删除记录
-                    c.execute("DELETE FROM reports WHERE id = ?", (report_id,))
-                    deleted += 1
-                    print(f"Deleted expired report: {filepath}")
+            os.remove(filepath)
+            # 尝试删除父目录，如果空则删除
+            parent_dir = os.path.dirname(filepath)
+            if os.path.isdir(parent_dir) and not os.listdir(parent_dir):
+                os.rmdir(parent_dir)
+            expired_ids.append(report_id)
+            print(f"Deleted expired report: {filepath}")
+        except FileNotFoundError:
+            # 文件已不存在，只清理过期索引
+            expired_ids.append(report_id)
         except Exception as e:
             print(f"Error processing {filepath}: {e}")
 
-    conn.commit()
-    conn.close()
-    print(f"Cleanup complete. Deleted {deleted} reports older than {days_to_keep} days.")
+    # 在一个事务中批量删除数据库记录
+    with conn:
+        conn.executemany("DELETE FROM reports WHERE id = ?", [(report_id,) for report_id in expired_ids])
+    print(f"Cleanup complete. Deleted {len(expired_ids)} reports older than {days_to_keep} days.")
 
 
 if __name__ == '__main__':
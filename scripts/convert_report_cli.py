@@ -1,17 +1,15 @@
 # scripts/convert_report_cli.py
 import argparse
-import json
 import os
 import sys
 
+import orjson
+
 # Add the project root to the Python path to allow imports from 'backend'
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-# Now we can import our modules
-from backend.core.report_converter import ReportConverter
-
 def main():
     """
     Command-line interface for converting a markdown report and a chart image into a single image.
@@ -45,8 +43,8 @@ def main():
         sys.exit(1)
 
     try:
-        key_data = json.loads(args.key_data_json)
-    except json.JSONDecodeError as e:
+        key_data = orjson.loads(args.key_data_json)
+    except orjson.JSONDecodeError as e:
         print(f"Error decoding key_data JSON: {e}", file=sys.stderr)
         sys.exit(1)
 
@@ -54,6 +52,9 @@ def main():
     print(f"Ticker: {args.ticker}, Interval: {args.interval}")
     print(f"Outputting final report to: {args.output_file}")
 
+    # Imported only now so --help and argument errors return without loading Playwright/markdown2
+    from backend.core.report_converter import ReportConverter
+
     converter = ReportConverter()
     
     success = converter.markdown_to_image(
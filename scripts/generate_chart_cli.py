@@ -1,85 +1,190 @@
 # scripts/generate_chart_cli.py
 import argparse
-import json
 import os
 import sys
-import pandas as pd
+
+import orjson
 
 # Add the project root to the Python path to allow importing from 'backend'
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-# Now we can import our modules
-from backend.core.chart_generator import ChartGenerator
-# Data fetcher is no longer needed here
-# from backend.core.data_fetcher import get_ohlcv_data
+def _write_file(path: str, data: bytes) -> None:
+    """
+    Writes bytes with a single write() to a temporary sibling file, then renames it
+    into place, so readers never observe a partially written output.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
 
-def main():
+def _load_data(path: str):
     """
-    This script is a command-line interface for generating a single stock chart image
-    from pre-fetched data. It loads data from a file, generates a chart, and saves
-    the resulting image and key financial data to specified output files.
+    Loads the OHLCV frame from a .parquet, .feather or legacy orient='split' .json
+    file; the JSON form may also be gzip (.json.gz) or zstd (.json.zst) compressed.
+    The binary formats are input options for external callers; the backend renders
+    charts in-process and never writes these files itself.
     """
-    parser = argparse.ArgumentParser(description="Generate a stock chart image from pre-fetched data.")
-    parser.add_argument("--ticker", type=str, required=True, help="Stock ticker symbol (e.g., AAPL, BTC-USD).")
-    parser.add_argument("--interval", type=str, default="1d", help="Data interval (e.g., 1h, 4h, 1d).")
-    # This is now for context, the actual data is from the file
-    # parser.add_argument("--num-candles", type=int, default=150, help="Number of candles to display on the chart.")
-    parser.add_argument("--input-data-file", type=str, required=True, help="Path to the JSON file containing OHLCV data.")
-    parser.add_argument("--output-image", type=str, required=True, help="Path to save the output chart image.")
-    parser.add_argument("--output-data", type=str, required=True, help="Path to save the output key data JSON file.")
-    
-    args = parser.parse_args()
+    import numpy as np
+    import pandas as pd
 
-    print(f"CLI: Starting chart generation for {args.ticker} from file {args.input_data_file}...")
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        # Columnar binary format: index and dtypes round-trip with no text parsing.
+        raw_df = pd.read_parquet(path, engine="pyarrow")
+    elif ext == ".feather":
+        raw_df = pd.read_feather(path)
+    else:
+        # Legacy JSON saved with orient='split' (epoch-millisecond index).
+        # Parsing with orjson and building the frame directly skips pandas'
+        # slower JSON reader.
+        with open(path, "rb") as f:
+            raw = f.read()
+        # .json.gz / .json.zst inputs are decompressed in memory.
+        lowered = path.lower()
+        if lowered.endswith(".gz"):
+            import gzip
+            raw = gzip.decompress(raw)
+        elif lowered.endswith(".zst"):
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("Reading .zst input requires the 'zstandard' package.")
+            raw = zstandard.ZstdDecompressor().decompress(raw, max_output_size=1 << 30)
+        payload = orjson.loads(raw)
+        raw_index = payload["index"]
+        if raw_index and isinstance(raw_index[0], int):
+            # Integer epochs become datetimes by reinterpreting the int64 buffer,
+            # without per-element parsing.
+            index = pd.DatetimeIndex(np.asarray(raw_index, dtype=np.int64).view("datetime64[ms]"))
+        else:
+            index = pd.DatetimeIndex(pd.to_datetime(raw_index))
+        raw_df = pd.DataFrame(payload["data"], columns=payload["columns"], index=index)
+    # Downstream code expects the index to be named 'date'.
+    raw_df.index.name = "date"
+    return raw_df
 
-    # 1. Load data from the specified JSON file.
-    try:
-        # The dataframe was saved with orient='split' to preserve the index.
-        raw_df = pd.read_json(args.input_data_file, orient='split')
-        
-        # Defensive fix: Ensure the index name is correct right after loading.
-        # This prevents any KeyError downstream regardless of serialization quirks.
-        raw_df.index.name = 'date'
+def _process_one(job: dict, chart_gen) -> None:
+    """
+    Runs a single chart job: load the data file, generate the chart and key data,
+    and save both outputs. Raises RuntimeError describing the failed stage.
+    """
+    ticker = job["ticker"]
+    interval = job.get("interval") or "1d"
+    input_data_file = job["input_data_file"]
+
+    print(f"CLI: Starting chart generation for {ticker} from file {input_data_file}...")
 
+    # 1. Load data from the specified file.
+    try:
+        raw_df = _load_data(input_data_file)
         if raw_df is None or raw_df.empty:
-            raise ValueError(f"No data loaded from file {args.input_data_file}.")
+            raise ValueError(f"No data loaded from file {input_data_file}.")
         print(f"CLI: Successfully loaded {len(raw_df)} data points.")
     except Exception as e:
-        print(f"CLI: Error loading data from file: {e}", file=sys.stderr)
-        sys.exit(1)
+        raise RuntimeError(f"Error loading data from file: {e}") from e
 
     # 2. Generate the chart image and key data.
     try:
-        chart_gen = ChartGenerator()
         image_bytes, key_data = chart_gen.generate_chart_from_df(
             raw_df=raw_df,
-            ticker_symbol=args.ticker,
-            interval=args.interval
+            ticker_symbol=ticker,
+            interval=interval
         )
         if not image_bytes or not key_data:
             raise RuntimeError("Chart generation returned empty data.")
         print("CLI: Successfully generated chart image and key data.")
     except Exception as e:
-        print(f"CLI: Error during chart generation: {e}", file=sys.stderr)
-        sys.exit(1)
+        raise RuntimeError(f"Error during chart generation: {e}") from e
 
     # 3. Save the outputs to the specified files.
     try:
-        with open(args.output_image, "wb") as f:
-            f.write(image_bytes)
-        print(f"CLI: Chart image saved to {args.output_image}")
+        _write_file(job["output_image"], image_bytes)
+        print(f"CLI: Chart image saved to {job['output_image']}")
+
+        # orjson writes UTF-8 bytes directly (no ASCII escaping) and handles numpy scalars
+        _write_file(job["output_data"], orjson.dumps(key_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+        print(f"CLI: Key data saved to {job['output_data']}")
+    except Exception as e:
+        raise RuntimeError(f"Error saving output files: {e}") from e
+
+def _serve(chart_gen) -> None:
+    """
+    Reads newline-delimited JSON jobs from stdin and answers each with one JSON
+    line on stdout, so a batch of charts pays the import and setup cost once.
+    Job keys mirror the single-shot options: ticker, interval, input_data_file,
+    output_image, output_data.
+    """
+    out = sys.stdout.buffer
+    # Progress messages (ours and the chart generator's) go to stderr so stdout
+    # carries only the protocol lines.
+    sys.stdout = sys.stderr
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            job = orjson.loads(line)
+            _process_one(job, chart_gen)
+            reply = {"ok": True, "image": job["output_image"], "data": job["output_data"]}
+        except Exception as e:
+            print(f"CLI: {e}")
+            reply = {"ok": False, "error": str(e)}
+        out.write(orjson.dumps(reply) + b"\n")
+        out.flush()
+
+def main():
+    """
+    This script is a command-line interface for generating a single stock chart image
+    from pre-fetched data. It loads data from a file, generates a chart, and saves
+    the resulting image and key financial data to specified output files.
+    With --server it instead processes a stream of such jobs from stdin.
+    """
+    parser = argparse.ArgumentParser(description="Generate a stock chart image from pre-fetched data.")
+    parser.add_argument("--ticker", type=str, help="Stock ticker symbol (e.g., AAPL, BTC-USD).")
+    parser.add_argument("--interval", type=str, default="1d", help="Data interval (e.g., 1h, 4h, 1d).")
+    # This is now for context, the actual data is from the file
+    # parser.add_argument("--num-candles", type=int, default=150, help="Number of candles to display on the chart.")
+    parser.add_argument("--input-data-file", type=str, help="Path to the OHLCV data file (.parquet, .feather or legacy orient='split' .json, optionally .gz/.zst compressed).")
+    parser.add_argument("--output-image", type=str, help="Path to save the output chart image.")
+    parser.add_argument("--output-data", type=str, help="Path to save the output key data JSON file.")
+    parser.add_argument("--server", action="store_true", help="Read newline-delimited JSON jobs from stdin and write one JSON result per line to stdout.")
+    
+    args = parser.parse_args()
+    if not args.server:
+        missing = [opt for opt, value in (("--ticker", args.ticker),
+                                          ("--input-data-file", args.input_data_file),
+                                          ("--output-image", args.output_image),
+                                          ("--output-data", args.output_data)) if not value]
+        if missing:
+            parser.error(f"the following arguments are required: {', '.join(missing)}")
 
-        with open(args.output_data, "w", encoding="utf-8") as f:
-            json.dump(key_data, f, ensure_ascii=False, indent=4)
-        print(f"CLI: Key data saved to {args.output_data}")
+    # Heavy imports (pandas, pandas_ta, Playwright) are deferred until the arguments are valid
+    from backend.core.chart_generator import ChartGenerator
 
+    try:
+        chart_gen = ChartGenerator()
     except Exception as e:
-        print(f"CLI: Error saving output files: {e}", file=sys.stderr)
+        print(f"CLI: Error during chart generation: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.server:
+        # Keep one browser running for the whole batch instead of launching one per chart
+        try:
+            chart_gen.warm()
+            _serve(chart_gen)
+        finally:
+            chart_gen.close()
+        return
+
+    try:
+        _process_one(vars(args), chart_gen)
+    except RuntimeError as e:
+        print(f"CLI: {e}", file=sys.stderr)
         sys.exit(1)
         
     print("CLI: Chart generation process completed successfully.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
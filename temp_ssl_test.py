@@ -1,6 +1,8 @@
 import requests
 import certifi
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 # Explicitly set environment variables that requests might use
 # (though requests usually picks up certifi automatically)
@@ -18,21 +20,28 @@ url = "https://query1.finance.yahoo.com/v7/finance/spark?symbols=AAPL&range=1d&i
 
 print(f"Attempting to GET: {url}")
 
-try:
-    response = requests.get(url, timeout=10)
-    response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-    print("SUCCESS! Connected and got a response.")
-    print(f"Status Code: {response.status_code}")
-    # print(f"Response content (first 200 chars): {response.text[:200]}")
-except requests.exceptions.SSLError as e:
-    print(f"SSL ERROR: {e}")
-except requests.exceptions.ConnectionError as e:
-    print(f"CONNECTION ERROR: {e}")
-except requests.exceptions.HTTPError as e:
-    print(f"HTTP ERROR: {e}")
-    print(f"Status Code: {e.response.status_code}")
-    print(f"Response content: {e.response.text}")
-except requests.exceptions.RequestException as e:
-    print(f"OTHER REQUESTS ERROR: {e}")
-except Exception as e:
-    print(f"UNEXPECTED ERROR: {e}") 
\ No newline at end of file
+# Reuse one pooled session so any further requests skip the TCP/TLS handshake
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+session.verify = certifi_path
+
+with session:
+    try:
+        response = session.get(url, timeout=10)
+        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
+        print("SUCCESS! Connected and got a response.")
+        print(f"Status Code: {response.status_code}")
+        # print(f"Response content (first 200 chars): {response.text[:200]}")
+    except requests.exceptions.SSLError as e:
+        print(f"SSL ERROR: {e}")
+    except requests.exceptions.ConnectionError as e:
+        print(f"CONNECTION ERROR: {e}")
+    except requests.exceptions.HTTPError as e:
+        print(f"HTTP ERROR: {e}")
+        print(f"Status Code: {e.response.status_code}")
+        print(f"Response content: {e.response.text}")
+    except requests.exceptions.RequestException as e:
+        print(f"OTHER REQUESTS ERROR: {e}")
+    except Exception as e:
+        print(f"UNEXPECTED ERROR: {e}") 
@@ -3,6 +3,7 @@
 测试本地预处理 + 缓存优化的效果
 """
 import asyncio
+import logging
 import time
 import sys
 import os
@@ -12,10 +13,12 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.core.instruction_validator import validate_and_extract_command, clear_instruction_cache, get_cache_stats
 
+logger = logging.getLogger(__name__)
+
 async def test_instruction_performance():
     """测试指令验证的性能优化效果"""
     
-    print("🚀 指令验证性能测试开始...")
+    logger.info("🚀 指令验证性能测试开始...")
     
     # 清空缓存
     clear_instruction_cache()
@@ -40,72 +43,75 @@ async def test_instruction_performance():
     results = []
     
     for i, test_input in enumerate(test_cases):
-        print(f"\n📊 测试 {i+1}/{len(test_cases)}: '{test_input}'")
+        logger.info("\n📊 测试 %d/%d: '%s'", i + 1, len(test_cases), test_input)
         
         # 第一次调用（可能缓存未命中）
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = await validate_and_extract_command(test_input)
-        first_duration = time.time() - start_time
+        first_duration = time.perf_counter() - start_time
         
         # 第二次调用（应该缓存命中）
-        start_time = time.time()
+        start_time = time.perf_counter()
         result_cached = await validate_and_extract_command(test_input)
-        second_duration = time.time() - start_time
+        second_duration = time.perf_counter() - start_time
         
         # 验证两次结果一致
         assert result == result_cached, "缓存结果不一致！"
+        # 缓存命中直接返回首次调用缓存的同一个结果对象
+        assert result_cached is result, "第二次调用未命中缓存！"
         
         results.append({
             "input": test_input,
             "first_call": first_duration,
             "cached_call": second_duration,
-            "speedup": first_duration / max(second_duration, 0.001),
+            "speedup": first_duration / second_duration,
             "status": result["status"],
-            "used_llm": first_duration > 0.1  # 估算是否使用了LLM
+            "used_llm": result.get("path") == "llm"  # 验证器返回的实际处理路径
         })
         
-        print(f"   📈 首次: {first_duration:.3f}s | 缓存: {second_duration:.3f}s | 提速: {first_duration/max(second_duration, 0.001):.1f}x")
-        print(f"   ✅ 状态: {result['status']}")
+        logger.info("   📈 首次: %.3fs | 缓存: %.3fs | 提速: %.1fx", first_duration, second_duration, first_duration / second_duration)
+        logger.info("   ✅ 状态: %s", result["status"])
         if result["command"]:
-            print(f"   📝 命令: {result['command']}")
+            logger.info("   📝 命令: %s", result["command"])
     
     # 汇总统计
-    print(f"\n📊 === 性能测试汇总 ===")
+    logger.info("\n📊 === 性能测试汇总 ===")
     cache_stats = get_cache_stats()
-    print(f"缓存条目数: {cache_stats['cached_instructions']}")
+    logger.info("缓存条目数: %d", cache_stats["cached_instructions"])
     
     local_processed = [r for r in results if not r["used_llm"]]
     llm_processed = [r for r in results if r["used_llm"]]
     
-    print(f"\n🔥 本地处理 ({len(local_processed)}个):")
+    logger.info("\n🔥 本地处理 (%d个):", len(local_processed))
     if local_processed:
         avg_local = sum(r["first_call"] for r in local_processed) / len(local_processed)
-        print(f"   平均响应时间: {avg_local:.3f}s")
-        print(f"   最快: {min(r['first_call'] for r in local_processed):.3f}s")
-        print(f"   最慢: {max(r['first_call'] for r in local_processed):.3f}s")
+        logger.info("   平均响应时间: %.3fs", avg_local)
+        logger.info("   最快: %.3fs", min(r["first_call"] for r in local_processed))
+        logger.info("   最慢: %.3fs", max(r["first_call"] for r in local_processed))
     
-    print(f"\n🧠 LLM处理 ({len(llm_processed)}个):")
+    logger.info("\n🧠 LLM处理 (%d个):", len(llm_processed))
     if llm_processed:
         avg_llm = sum(r["first_call"] for r in llm_processed) / len(llm_processed)
-        print(f"   平均响应时间: {avg_llm:.3f}s")
-        print(f"   最快: {min(r['first_call'] for r in llm_processed):.3f}s")
-        print(f"   最慢: {max(r['first_call'] for r in llm_processed):.3f}s")
+        logger.info("   平均响应时间: %.3fs", avg_llm)
+        logger.info("   最快: %.3fs", min(r["first_call"] for r in llm_processed))
+        logger.info("   最慢: %.3fs", max(r["first_call"] for r in llm_processed))
     
-    print(f"\n⚡ 缓存效果:")
+    logger.info("\n⚡ 缓存效果:")
     avg_first = sum(r["first_call"] for r in results) / len(results)
     avg_cached = sum(r["cached_call"] for r in results) / len(results)
-    print(f"   首次平均: {avg_first:.3f}s")
-    print(f"   缓存平均: {avg_cached:.3f}s")
-    print(f"   整体提速: {avg_first/max(avg_cached, 0.001):.1f}x")
+    logger.info("   首次平均: %.3fs", avg_first)
+    logger.info("   缓存平均: %.3fs", avg_cached)
+    logger.info("   整体提速: %.1fx", avg_first / avg_cached)
     
     # 显示优化建议
     slow_cases = [r for r in results if r["first_call"] > 1.0]
     if slow_cases:
-        print(f"\n⚠️  慢查询 (>1s):")
+        logger.info("\n⚠️  慢查询 (>1s):")
         for case in slow_cases:
-            print(f"   '{case['input']}': {case['first_call']:.3f}s")
+            logger.info("   '%s': %.3fs", case["input"], case["first_call"])
     
-    print(f"\n🎉 测试完成！智能缓存系统运行正常。")
+    logger.info("\n🎉 测试完成！智能缓存系统运行正常。")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     asyncio.run(test_instruction_performance()) 
\ No newline at end of file